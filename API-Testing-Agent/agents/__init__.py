@@ -11,6 +11,6 @@ Usage:
 
 from .document_classifier_agent import DocumentClassifierAgent
 from .api_testing_agent import APITestingAgent
-from .workflow import run_workflow
+from .workflow import run_workflow, run_workflow_async
 
-__all__ = ["DocumentClassifierAgent", "APITestingAgent", "run_workflow"]
+__all__ = ["DocumentClassifierAgent", "APITestingAgent", "run_workflow", "run_workflow_async"]
@@ -10,13 +10,139 @@ What this does:
 Think of it like: Agent tries to match the right document to each API
 """
 
-import json
+import asyncio
 import mimetypes
 import os
 import random
 import re
-import requests
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from functools import lru_cache
+import aiofiles
+import aiohttp
 import google.generativeai as genai
+from . import gemini_stream, json_io, llm_cache
+from .prompt_cache import delete_cached_prompt, load_cached_prompt
+
+
+# How many APIs we test at the same time
+MAX_CONCURRENT_UPLOADS = 16
+
+# If we can't even connect to an API, try again this many times
+# (waiting 0.2s, then 0.4s, ...) before calling it a failure
+CONNECT_RETRIES = 2
+CONNECT_BACKOFF = 0.2
+
+# Matches Postman variables like {{base_url}}
+_VAR_RE = re.compile(r"\{\{([^}]+)\}\}")
+
+# Splits names, URLs and document types into words ("verify-pan" -> verify, pan)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Words too common in document type names to tell them apart ("PAN card" vs "Aadhaar card")
+_GENERIC_TYPE_WORDS = {"card", "document", "proof", "copy", "certificate", "of"}
+
+# Documents up to this size are kept in memory so retries don't read them
+# from disk again (64 files x 4 MiB = at most 256 MiB). Bigger ones are streamed.
+SMALL_FILE_LIMIT = 4 * 1024 * 1024
+
+# Common file types, for when mimetypes can't tell
+_EXT_MIME = {
+    '.pdf': 'application/pdf',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png'
+}
+
+
+def _mime_for(file_path: str):
+    """
+    Figure out the file type (MIME type) of a document
+    """
+    mime_type, _ = mimetypes.guess_type(file_path)
+    if not mime_type:
+        ext = os.path.splitext(file_path)[1].lower()
+        mime_type = _EXT_MIME.get(ext, 'application/octet-stream')
+    return mime_type
+
+
+@lru_cache(maxsize=1024)
+def _file_meta(file_path: str):
+    """
+    Get (file name, MIME type) for a document
+    (remembered, since the same document is uploaded again on retries)
+    """
+    return os.path.basename(file_path), _mime_for(file_path)
+
+
+@lru_cache(maxsize=64)
+def _read_small_file(file_path: str):
+    """
+    Read a whole document (remembered for the next upload of the same file)
+    """
+    with open(file_path, "rb") as f:
+        return f.read()
+
+
+def _small_file_bytes(file_path: str):
+    """
+    Get a document's bytes if it's small enough to keep in memory
+    
+    Returns: The bytes, or None if the file is big and should be streamed
+    """
+    if os.path.getsize(file_path) > SMALL_FILE_LIMIT:
+        return None
+    return _read_small_file(file_path)
+
+
+async def _stream_file(file_path: str, chunk_size: int = 64 * 1024):
+    """
+    Read a file from disk in small chunks (so big files never sit fully in memory)
+    """
+    async with aiofiles.open(file_path, "rb") as f:
+        while True:
+            chunk = await f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def _bounded(semaphore, coro):
+    """
+    Run a coroutine once the semaphore lets it (limits how many run at once)
+    """
+    async with semaphore:
+        return await coro
+
+
+async def _document_body(file_path: str):
+    """
+    Get a document ready for aiohttp: bytes if it's small, a chunk stream if not
+    (the size check and first read happen in a thread, so the event loop
+    keeps serving other uploads meanwhile)
+    """
+    file_content = await asyncio.to_thread(_small_file_bytes, file_path)
+    if file_content is None:
+        return _stream_file(file_path)
+    return file_content
+
+
+@dataclass(frozen=True)
+class CompiledAPI:
+    """
+    A Postman request with everything worked out ahead of time
+    ({{variables}} filled in, headers collected, body type decided),
+    so testing it - and retrying it - only needs a document plugged in
+    """
+    __slots__ = ("name", "method", "url", "headers", "mode", "formdata", "words")
+    
+    name: str
+    method: str
+    url: str
+    headers: tuple   # ((key, value), ...)
+    mode: str        # "formdata", "file", "binary" (or "" for no body)
+    formdata: tuple  # ((key, is_file, value), ...) - value is "" for file fields
+    words: frozenset  # Lowercase words in the name and URL, to guess the document type
 
 
 class APITestingAgent:
@@ -31,7 +157,24 @@ class APITestingAgent:
         self.api_key = api_key
         genai.configure(api_key=api_key)
         self.doc_map = {}  # Will store document classifications
+        self._by_type = defaultdict(list)  # {"passport": [file_path, ...]}
+        self._type_index = {}  # {"passport": first file_path of that type}
+        self._type_list = []  # [("passport", file_path), ...] for partial matches
+        self._type_words = {}  # {"driving license": {"driving", "license"}} for guessing
         self.env_vars = {}  # Will store environment variables
+        self._env_get = self.env_vars.get  # Shortcut used for every {{variable}}
+        
+        # Give Gemini the error-analysis instructions once, up front
+        self._err_instructions, self._err_cache = load_cached_prompt(
+            "prompts/normalize_error.md", "gemini-2.0-flash-exp"
+        )
+    
+    def close(self):
+        """
+        Clean up when we're done testing (removes our cached prompt from Gemini)
+        """
+        delete_cached_prompt(self._err_cache)
+        self._err_cache = None
     
     def set_documents(self, doc_map: dict):
         """
@@ -41,6 +184,37 @@ class APITestingAgent:
                  {"file_path": {"document_type": "passport", "confidence": 0.95}}
         """
         self.doc_map = doc_map
+        
+        # Group the documents by type, so we can grab a likely match quickly
+        self._by_type = defaultdict(list)
+        self._type_index = {}
+        self._type_list = []
+        self._type_words = {}
+        for file_path, info in doc_map.items():
+            self._index_document(file_path, info)
+    
+    def add_document(self, file_path: str, info: dict):
+        """
+        Give the agent one more classified document
+        (for when documents arrive one at a time, see test_apis_async)
+        """
+        self.doc_map[file_path] = info
+        self._index_document(file_path, info)
+    
+    def _index_document(self, file_path: str, info: dict):
+        """
+        Internal helper: Remember a document under its (lowercase) type
+        """
+        doc_type = info.get("document_type", "").lower()
+        self._type_index.setdefault(doc_type, file_path)
+        self._type_list.append((doc_type, file_path))
+        
+        if doc_type and doc_type not in ("unknown", "failed"):
+            self._by_type[doc_type].append(file_path)
+            
+            # Split a new type into the words that set it apart, once
+            if doc_type not in self._type_words:
+                self._type_words[doc_type] = set(_WORD_RE.findall(doc_type)) - _GENERIC_TYPE_WORDS
     
     def set_environment(self, env_vars: dict):
         """
@@ -49,134 +223,289 @@ class APITestingAgent:
         env_vars: Dictionary like {"base_url": "http://localhost:8000"}
         """
         self.env_vars = env_vars
+        self._env_get = env_vars.get
     
-    def test_apis(self, postman_collection_path: str):
+    async def test_apis(self, postman_collection_path: str):
         """
         Main function: Test all APIs from a Postman collection
         
         postman_collection_path: Path to your .postman_collection.json file
         
+        All uploads share one aiohttp session and run at the same time (up to
+        MAX_CONCURRENT_UPLOADS). APIs that fail get a second round: we ask
+        Gemini what they need and retry them, again all at once.
+        Run it with asyncio.run(...).
+        
         Returns: List of test results
         """
-        # Step 1: Load the Postman collection
-        with open(postman_collection_path, "r") as f:
-            collection = json.load(f)
+        # Step 1 + 2: Load the Postman collection and find APIs that need file uploads
+        upload_apis = self._load_upload_apis(postman_collection_path)
         
-        # Step 2: Find APIs that need file uploads
-        all_apis = self._find_all_apis(collection)
-        upload_apis = [api for api in all_apis if self._needs_file_upload(api)]
+        used_documents = set()  # Track which docs we've successfully used
+        claimed_documents = set()  # Docs an API is being tested with right now
         
-        print(f"\n📋 Found {len(upload_apis)} APIs that need file uploads\n")
+        # Only let a few uploads run at once so we don't flood the server
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPLOADS)
+        
+        connector = aiohttp.TCPConnector(limit=64)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            # Step 3: Test each API with a likely (or random) document
+            first_tries = await asyncio.gather(*[
+                _bounded(semaphore, self._try_first_document(session, api, used_documents,
+                                                             claimed_documents))
+                for api in upload_apis
+            ])
+            
+            # Step 4: Retry the APIs that failed with the document they need
+            await self._retry_failed(session, semaphore, upload_apis, first_tries,
+                                     used_documents)
+        
+        # APIs we had no document for are skipped
+        return [result for result in first_tries if result]
+    
+    async def test_apis_async(self, postman_collection_path: str, doc_queue: asyncio.Queue):
+        """
+        Same as test_apis, but documents arrive one at a time while they're
+        still being classified
+        
+        postman_collection_path: Path to your .postman_collection.json file
+        doc_queue: Queue of (file_path, classification) pairs, ending with None
+                   when there are no more documents
+        
+        An API is tested as soon as a document its name hints at arrives
+        (like "verify-passport" and a passport). The other APIs wait until
+        every document is in, then get a random one as usual.
+        
+        Returns: List of test results
+        """
+        upload_apis = self._load_upload_apis(postman_collection_path)
         
-        # Step 3: Test each API
-        results = []
         used_documents = set()  # Track which docs we've successfully used
+        claimed_documents = set()  # Docs an API is being tested with right now
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPLOADS)
+        first_try_tasks = {}  # {index in upload_apis: task}
         
-        for api in upload_apis:
-            api_name = api.get("name", "unnamed")
-            print(f"🧪 Testing: {api_name}")
-            
-            # Pick a random document that we haven't used yet
-            available_docs = {path: info for path, info in self.doc_map.items() 
-                            if path not in used_documents}
-            
-            if not available_docs:
-                print("  ⚠️  No more documents available\n")
-                continue
-            
-            random_file = random.choice(list(available_docs.keys()))
-            doc_info = available_docs[random_file]
-            
-            print(f"  📄 Trying: {os.path.basename(random_file)}")
-            print(f"     Type: {doc_info.get('document_type', 'unknown')}")
-            
-            # Test the API with this document
-            result = self._test_one_api(api, random_file, doc_info)
+        connector = aiohttp.TCPConnector(limit=64)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            def start(index):
+                coro = self._try_first_document(session, upload_apis[index], used_documents,
+                                                claimed_documents)
+                first_try_tasks[index] = asyncio.create_task(_bounded(semaphore, coro))
             
-            # Check if it worked
-            if result["success"]:
-                print(f"  ✅ Success!\n")
-                used_documents.add(random_file)
-            else:
-                # It failed - let's try to understand why
-                print(f"  ❌ Failed: {result['error_message'][:100]}...")
+            # Step 3a: As documents arrive, start the APIs that want them
+            while True:
+                item = await doc_queue.get()
+                if item is None:
+                    break
                 
-                # Ask Gemini what document type this API needs
-                required_type = self._ask_gemini_what_went_wrong(result)
+                file_path, info = item
+                self.add_document(file_path, info)
+                doc_type = info.get("document_type", "").lower()
                 
-                if required_type:
-                    print(f"  💡 API needs: {required_type}")
-                    
-                    # Find a document of that type
-                    matching_doc = self._find_document_by_type(required_type)
-                    
-                    if matching_doc:
-                        print(f"  🔄 Retrying with: {os.path.basename(matching_doc)}")
-                        retry_result = self._test_one_api(api, matching_doc, self.doc_map[matching_doc])
-                        
-                        if retry_result["success"]:
-                            print(f"  ✅ Retry succeeded!\n")
-                            used_documents.add(matching_doc)
-                            result["retry_success"] = True
-                            result["correct_document"] = matching_doc
-                        else:
-                            print(f"  ❌ Retry also failed\n")
-                    else:
-                        print(f"  ⚠️  No {required_type} document found\n")
-                else:
-                    print(f"  ⚠️  Couldn't determine what went wrong\n")
+                for index, api in enumerate(upload_apis):
+                    if index not in first_try_tasks and self._guess_type_from_api(api) == doc_type:
+                        start(index)
             
-            results.append(result)
+            # Step 3b: All documents are in - test the APIs that are still waiting
+            for index in range(len(upload_apis)):
+                if index not in first_try_tasks:
+                    start(index)
+            
+            first_tries = [await first_try_tasks[index] for index in range(len(upload_apis))]
+            
+            # Step 4: Retry the APIs that failed with the document they need
+            await self._retry_failed(session, semaphore, upload_apis, first_tries,
+                                     used_documents)
         
-        return results
+        # APIs we had no document for are skipped
+        return [result for result in first_tries if result]
     
-    def _test_one_api(self, api_config: dict, file_path: str, doc_info: dict):
+    def _load_upload_apis(self, postman_collection_path: str):
+        """
+        Internal helper: Load a Postman collection and return the APIs that need file uploads
+        """
+        with open(postman_collection_path, "rb") as f:
+            collection = json_io.loads(f.read())
+        
+        upload_apis = [self._compile(api) for api, needs_upload in self._find_all_apis(collection)
+                       if needs_upload]
+        
+        print(f"\n📋 Found {len(upload_apis)} APIs that need file uploads\n")
+        return upload_apis
+    
+    async def _retry_failed(self, session, semaphore, upload_apis: list, first_tries: list,
+                            used_documents: set):
+        """
+        Internal helper: Retry every API whose first try failed, all at the same time
+        """
+        await asyncio.gather(*[
+            _bounded(semaphore, self._retry_with_right_document(session, api, result,
+                                                                used_documents))
+            for api, result in zip(upload_apis, first_tries)
+            if result and not result["success"]
+        ])
+    
+    async def _try_first_document(self, session, api: CompiledAPI, used_documents: set,
+                                  claimed_documents: set):
+        """
+        Internal helper: Test one API with a document we haven't used yet
+        (if the API's name or URL hints at a type, like "verify-passport",
+        we try a document of that type first; otherwise we pick at random)
+        
+        Many first tries run at once, so the chosen document is claimed before
+        the upload starts - other APIs then pick a different one while they can
+        """
+        api_name = api.name
+        
+        # Only consider documents that we haven't used yet
+        available_docs = {path: info for path, info in self.doc_map.items() 
+                        if path not in used_documents}
+        
+        if not available_docs:
+            print(f"🧪 {api_name}: ⚠️  No more documents available")
+            return None
+        
+        # Skip documents other APIs are busy with (unless that's all there is -
+        # then share one, since there can be more APIs than documents)
+        free_docs = [path for path in available_docs if path not in claimed_documents]
+        candidates = free_docs or list(available_docs)
+        
+        # Prefer a document whose type the API hints at, else pick at random
+        guessed_type = self._guess_type_from_api(api)
+        guessed_docs = [path for path in self._by_type.get(guessed_type, [])
+                        if path in candidates]
+        
+        if guessed_docs:
+            chosen_file = guessed_docs[0]
+        else:
+            chosen_file = random.choice(candidates)
+        doc_info = available_docs[chosen_file]
+        filename = os.path.basename(chosen_file)
+        doc_type = doc_info.get("document_type", "unknown")
+        
+        # Test the API with this document (claimed while the upload runs)
+        claimed_documents.add(chosen_file)
+        try:
+            result = await self._test_one_api_async(session, api, chosen_file, doc_info)
+        finally:
+            claimed_documents.discard(chosen_file)
+        
+        # Check if it worked
+        if result["success"]:
+            print(f"🧪 {api_name}: ✅ Success with {filename} ({doc_type})")
+            used_documents.add(chosen_file)
+        else:
+            print(f"🧪 {api_name}: ❌ Failed with {filename} ({doc_type}): "
+                  f"{result['error_message'][:100]}...")
+        
+        return result
+    
+    def _guess_type_from_api(self, api: CompiledAPI):
+        """
+        Internal helper: Guess which document type an API wants from its name and URL
+        Example: "verify-driving-license" -> "driving license"
+        
+        Returns: One of our document types, or None if there's no hint
+        """
+        best_type, best_score = None, 0
+        for doc_type, type_words in self._type_words.items():
+            score = len(type_words & api.words)
+            if score > best_score:
+                best_type, best_score = doc_type, score
+        
+        return best_type
+    
+    async def _retry_with_right_document(self, session, api: CompiledAPI, result: dict,
+                                         used_documents: set):
+        """
+        Internal helper: Ask Gemini why an API failed, then retry it with the
+        right type of document (updates `result` in place)
+        """
+        api_name = api.name
+        
+        # Ask Gemini what document type this API needs
+        # (in a thread, so the other uploads keep going while we wait)
+        required_type = await asyncio.to_thread(self._ask_gemini_what_went_wrong, result)
+        
+        if not required_type:
+            print(f"  ⚠️  {api_name}: Couldn't determine what went wrong")
+            return
+        
+        # Find a document of that type
+        matching_doc = self._find_document_by_type(required_type)
+        
+        if not matching_doc:
+            print(f"  ⚠️  {api_name}: needs {required_type}, but no such document found")
+            return
+        
+        print(f"  🔄 {api_name}: needs {required_type}, retrying with "
+              f"{os.path.basename(matching_doc)}")
+        retry_result = await self._test_one_api_async(session, api, matching_doc,
+                                                      self.doc_map[matching_doc])
+        
+        if retry_result["success"]:
+            print(f"  ✅ {api_name}: Retry succeeded!")
+            used_documents.add(matching_doc)
+            result["retry_success"] = True
+            result["correct_document"] = matching_doc
+        else:
+            print(f"  ❌ {api_name}: Retry also failed")
+    
+    async def _test_one_api_async(self, session, api: CompiledAPI, file_path: str,
+                                  doc_info: dict):
         """
         Internal helper: Test one API endpoint with one document
+        (sent with aiohttp; big files are streamed from disk, not loaded into memory)
         """
         try:
-            # Build the HTTP request
-            method, url, headers, body_data = self._build_request(api_config, file_path)
-            
-            # Send the request
-            if body_data.get("files"):
-                response = requests.request(method, url, headers=headers, 
-                                          files=body_data["files"], timeout=30)
-            elif body_data.get("content"):
-                response = requests.request(method, url, headers=headers, 
-                                          data=body_data["content"], timeout=30)
-            else:
-                response = requests.request(method, url, headers=headers, timeout=30)
+            # Send the request (retrying only if the connection itself fails)
+            # 30s to connect and 30s between reads - no limit on the whole upload,
+            # so big files that stream slowly still get through
+            timeout = aiohttp.ClientTimeout(sock_connect=30, sock_read=30)
+            for attempt in range(CONNECT_RETRIES + 1):
+                try:
+                    # Build the request body with this document
+                    # (fresh every attempt - a file stream can only be read once)
+                    data = await self._build_body_async(api, file_path)
+                    
+                    async with session.request(api.method, api.url, headers=api.headers,
+                                               data=data, timeout=timeout) as response:
+                        text = await response.text()
+                        break
+                except aiohttp.ClientConnectorError:
+                    if attempt == CONNECT_RETRIES:
+                        raise
+                    await asyncio.sleep(CONNECT_BACKOFF * (2 ** attempt))
             
             # Check if successful
-            success = response.status_code in [200, 201, 204]
+            success = response.status in [200, 201, 204]
             
             return {
-                "api_name": api_config.get("name", "unnamed"),
-                "method": method,
-                "url": url,
+                "api_name": api.name,
+                "method": api.method,
+                "url": api.url,
                 "file_used": file_path,
                 "document_type": doc_info.get("document_type"),
                 "success": success,
-                "status_code": response.status_code,
-                "error_message": response.text if not success else "",
+                "status_code": response.status,
+                "error_message": text if not success else "",
                 "response_headers": dict(response.headers)
             }
-            
+        
         except Exception as e:
             return {
-                "api_name": api_config.get("name", "unnamed"),
+                "api_name": api.name,
                 "file_used": file_path,
                 "success": False,
-                "error_message": str(e)
+                "error_message": str(e) or type(e).__name__
             }
     
-    def _build_request(self, api_config: dict, file_path: str):
+    def _compile(self, api_config: dict):
         """
-        Internal helper: Convert Postman format to Python requests format
+        Internal helper: Work out everything about a Postman request that
+        doesn't depend on the document (done once, reused for every try)
         """
         request_data = api_config["request"]
-        method = request_data.get("method", "POST")
         
         # Get URL and replace {{variables}}
         url_data = request_data.get("url")
@@ -187,87 +516,89 @@ class APITestingAgent:
         url = self._replace_variables(url)
         
         # Get headers
-        headers = {}
+        headers = []
         for header in request_data.get("header", []):
             if header.get("key"):
-                headers[header["key"]] = self._replace_variables(header.get("value", ""))
+                headers.append((header["key"], self._replace_variables(header.get("value", ""))))
         
-        # Build body with file
+        # Get body fields (file fields are filled in later, with the document)
         body = request_data.get("body", {})
-        mode = body.get("mode")
+        formdata = []
+        for field in body.get("formdata", []):
+            if field.get("type") == "file":
+                formdata.append((field.get("key"), True, ""))
+            else:
+                formdata.append((field.get("key"), False,
+                                 self._replace_variables(field.get("value", ""))))
         
-        files_data = None
-        content_data = None
+        # Split the name and URL into words once (used to guess the document type)
+        name = api_config.get("name", "unnamed")
+        words = frozenset(_WORD_RE.findall(f"{name} {url}".lower()))
         
-        if mode == "formdata":
+        return CompiledAPI(
+            name=name,
+            method=request_data.get("method", "POST"),
+            url=url,
+            headers=tuple(headers),
+            mode=body.get("mode") or "",
+            formdata=tuple(formdata),
+            words=words
+        )
+    
+    async def _build_body_async(self, api: CompiledAPI, file_path: str):
+        """
+        Internal helper: Put a document into a compiled API, as an aiohttp body
+        (small files come from memory, big ones are streamed from disk in chunks)
+        """
+        if api.mode == "formdata":
             # Form with multiple fields
-            fields = []
-            for field in body.get("formdata", []):
-                key = field.get("key")
-                field_type = field.get("type")
-                
-                if field_type == "file":
+            form = aiohttp.FormData()
+            for key, is_file, value in api.formdata:
+                if is_file:
                     # This is where we attach our document
-                    with open(file_path, "rb") as f:
-                        file_content = f.read()
-                    
-                    # Figure out the file type (MIME type)
-                    mime_type, _ = mimetypes.guess_type(file_path)
-                    if not mime_type:
-                        # Common types
-                        ext = os.path.splitext(file_path)[1].lower()
-                        mime_types = {
-                            '.pdf': 'application/pdf',
-                            '.jpg': 'image/jpeg',
-                            '.jpeg': 'image/jpeg',
-                            '.png': 'image/png'
-                        }
-                        mime_type = mime_types.get(ext, 'application/octet-stream')
-                    
-                    fields.append((key, (os.path.basename(file_path), file_content, mime_type)))
+                    basename, mime_type = _file_meta(file_path)
+                    form.add_field(key, await _document_body(file_path),
+                                   filename=basename, content_type=mime_type)
                 else:
                     # Regular text field
-                    value = self._replace_variables(field.get("value", ""))
-                    fields.append((key, value))
-            
-            files_data = fields
+                    form.add_field(key, value)
+            return form
         
-        elif mode in ("file", "binary"):
+        if api.mode in ("file", "binary"):
             # Raw file upload
-            with open(file_path, "rb") as f:
-                content_data = f.read()
+            return await _document_body(file_path)
         
-        return method, url, headers, {"files": files_data, "content": content_data}
+        return None
     
     def _replace_variables(self, text: str):
         """
         Replace {{variable_name}} with actual values
         Example: {{base_url}}/upload becomes http://localhost:8000/upload
         """
-        def replacer(match):
-            var_name = match.group(1)
-            return self.env_vars.get(var_name, match.group(0))
-        
-        return re.sub(r"{{([^}]+)}}", replacer, text)
+        env_get = self._env_get
+        return _VAR_RE.sub(lambda match: env_get(match.group(1), match.group(0)), text)
     
     def _find_all_apis(self, collection: dict):
         """
         Internal helper: Extract all API requests from Postman collection
-        (Postman can have nested folders, so we need to search recursively)
+        (Postman can have nested folders, so we walk through all of them)
+        
+        Returns: List of (api, needs_upload) pairs, in collection order
         """
         apis = []
+        to_visit = deque([collection])
+        
+        while to_visit:
+            node = to_visit.popleft()
+            if not isinstance(node, dict):
+                continue
+            if "request" in node:
+                # This is an API - check right away if it needs a file
+                apis.append((node, self._needs_file_upload(node)))
+            if "item" in node:
+                # This is a folder, visit its items next (keeping their order)
+                to_visit.extendleft(reversed(node["item"]))
         
-        def search(node):
-            if isinstance(node, dict):
-                if "request" in node:
-                    # This is an API
-                    apis.append(node)
-                if "item" in node:
-                    # This is a folder, search inside
-                    for item in node["item"]:
-                        search(item)
-        
-        search(collection)
         return apis
     
     def _needs_file_upload(self, api: dict):
@@ -296,31 +627,35 @@ class APITestingAgent:
         Internal helper: Use Gemini AI to understand what document the API needs
         """
         try:
-            # Read the prompt that tells Gemini how to parse errors
-            with open("prompts/normalize_error.md", "r") as f:
-                instructions = f.read()
-            
             # Prepare error information for Gemini
-            error_info = json.dumps({
-                "status": error_result.get("status_code"),
-                "body": error_result.get("error_message", "")[:1000]
+            status = error_result.get("status_code")
+            error_body = error_result.get("error_message", "")[:1000]
+            error_info = json_io.dumps({
+                "status": status,
+                "body": error_body
             })
             
-            # Ask Gemini
-            model = genai.GenerativeModel("gemini-2.0-flash-exp")
-            response = model.generate_content([
-                instructions,
-                "\n\nError to analyze:\n",
-                error_info
-            ])
+            # Did we already ask Gemini about this exact error?
+            key = llm_cache.make_key(str(status), error_body, self._err_instructions)
+            cached = llm_cache.get(key)
+            if cached is not None:
+                return cached.get("required_document_type")
+            
+            # Ask Gemini (if the instructions are cached, only send the error)
+            if self._err_cache:
+                model = genai.GenerativeModel.from_cached_content(self._err_cache)
+                contents = ["Error to analyze:\n", error_info]
+            else:
+                model = genai.GenerativeModel("gemini-2.0-flash-exp")
+                contents = [self._err_instructions, "\n\nError to analyze:\n", error_info]
+            response = model.generate_content(contents, stream=True)
             
-            # Extract the answer
-            text = response.text.strip()
+            # Read the answer as it arrives, and stop as soon as it
+            # contains a complete JSON object
+            result = gemini_stream.read_json(response)
             
-            # Find JSON in response
-            json_match = re.search(r"{[\s\S]*}", text)
-            if json_match:
-                result = json.loads(json_match.group(0))
+            if result is not None:
+                llm_cache.set(key, result)
                 return result.get("required_document_type")
             
             return None
@@ -335,8 +670,13 @@ class APITestingAgent:
         """
         doc_type_lower = doc_type.lower()
         
-        for file_path, info in self.doc_map.items():
-            classified_type = info.get("document_type", "").lower()
+        # Exact match first (a quick dictionary lookup)
+        file_path = self._type_index.get(doc_type_lower)
+        if file_path:
+            return file_path
+        
+        # Otherwise accept a partial match, like "pan" for "pan card"
+        for classified_type, file_path in self._type_list:
             if doc_type_lower in classified_type or classified_type in doc_type_lower:
                 return file_path
         
@@ -9,10 +9,88 @@ What this does:
 Think of it like: Agent goes through your documents and labels each one
 """
 
-import json
+import asyncio
 import os
-import re
+import xxhash
 import google.generativeai as genai
+from . import gemini_stream, json_io, llm_cache
+from .prompt_cache import delete_cached_prompt, load_cached_prompt
+
+
+# How many documents we send to Gemini at the same time
+MAX_CONCURRENT_CLASSIFICATIONS = 16
+
+
+def _iter_docs(root: str):
+    """
+    Find every document under a folder (including subfolders),
+    skipping hidden files and markdown files
+    (folders we can't open are skipped too, like os.walk does)
+    """
+    try:
+        entries = os.scandir(root)
+    except OSError:
+        return
+    
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_docs(entry.path)
+            elif entry.is_file() and not entry.name.startswith(".") and not entry.name.endswith(".md"):
+                yield entry.path
+
+
+def _content_hash(file_path: str):
+    """
+    Fingerprint a file by its bytes (two copies of the same document get the
+    same hash, no matter what they're called)
+    """
+    digest = xxhash.xxh3_64()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hash_files(file_paths: list):
+    """
+    Fingerprint many files, one after another
+    (xxh3 is much faster than reading the disk, so extra CPU cores wouldn't help)
+    
+    Returns: {file_path: content_hash}
+    """
+    return {file_path: _content_hash(file_path) for file_path in file_paths}
+
+
+def _fingerprint_files(file_paths: list, known: dict):
+    """
+    Fingerprint files, reusing last run's hash for any file that hasn't
+    changed (same size and same modified time), so only new or edited
+    files are actually read
+    
+    known: What we saved last time, {file_path: {"hash", "size", "mtime"}}
+    
+    Returns: {file_path: {"hash": ..., "size": ..., "mtime": ...}}
+    """
+    fingerprints = {}
+    changed = []
+    
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+        
+        old = known.get(file_path)
+        if (isinstance(old, dict) and old.get("size") == entry["size"]
+                and old.get("mtime") == entry["mtime"]):
+            entry["hash"] = old["hash"]
+        else:
+            changed.append(file_path)
+        fingerprints[file_path] = entry
+    
+    for file_path, content_hash in _hash_files(changed).items():
+        fingerprints[file_path]["hash"] = content_hash
+    
+    return fingerprints
 
 
 class DocumentClassifierAgent:
@@ -27,106 +105,214 @@ class DocumentClassifierAgent:
         self.api_key = api_key
         genai.configure(api_key=api_key)
         self.cache = {}  # Remember files we already uploaded
+        
+        # Give Gemini the classification instructions once, up front
+        self._instructions, self._prompt_cache = load_cached_prompt(
+            "prompts/classify_document.md", "gemini-2.0-flash-exp"
+        )
+    
+    def close(self):
+        """
+        Clean up when we're done classifying (removes our cached prompt from Gemini)
+        """
+        delete_cached_prompt(self._prompt_cache)
+        self._prompt_cache = None
     
-    def classify_documents(self, docs_dir: str, cache_file: str = None):
+    async def classify_documents(self, docs_dir: str, cache_file: str = None):
         """
         Main function: Classify all documents in a folder
         
         docs_dir: Folder with your documents
         cache_file: File to save results (so we don't re-do work)
         
+        Documents are sent to Gemini at the same time (up to
+        MAX_CONCURRENT_CLASSIFICATIONS), so we wait for the network once
+        instead of once per document. Run it with asyncio.run(...).
+        
         Returns: A dictionary like {"file_path": {"type": "passport", "confidence": 0.95}}
         """
         results = {}
+        async for file_path, classification in self.iter_classifications(docs_dir, cache_file):
+            results[file_path] = classification
+        return results
+    
+    async def iter_classifications(self, docs_dir: str, cache_file: str = None):
+        """
+        Same as classify_documents, but hands out each document as soon as it's
+        classified, so other work (like API testing) can start right away
+        
+        Usage:
+            async for file_path, classification in agent.iter_classifications(docs_dir):
+                ...
+        
+        Yields: (file_path, classification) pairs - documents we already knew
+                about come first, then the rest in the order Gemini answers
+        """
+        results_by_hash = {}  # {content_hash: classification}
+        known_files = {}  # {file_path: {"hash", "size", "mtime"}} from last run
+        old_results = {}  # {file_path: classification} from an old-format cache file
+        journal_file = cache_file + ".ndjson" if cache_file else None
         
         # Step 1: Try to load previous results if they exist
         if cache_file and os.path.exists(cache_file):
             print(f"📂 Loading saved results from {cache_file}")
-            with open(cache_file, "r") as f:
-                results = json.load(f)
-            print(f"✓ Found {len(results)} previous results")
+            with open(cache_file, "rb") as f:
+                saved = json_io.loads(f.read())
+            
+            if "by_hash" in saved:
+                results_by_hash = saved["by_hash"]
+                known_files = saved.get("paths", {})
+            else:
+                # Old cache format: {"file_path": classification}
+                # (moved over to hashes below, once we've fingerprinted the files)
+                old_results = saved
+            print(f"✓ Found {len(results_by_hash) + len(old_results)} previous results")
+        
+        # Also pick up documents classified by a run that stopped halfway
+        if journal_file and os.path.exists(journal_file):
+            with open(journal_file, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json_io.loads(line)
+                    except ValueError:
+                        continue  # Empty or half-written line from the crash
+                    results_by_hash[entry["hash"]] = entry["result"]
         
         # Step 2: Find all document files
-        all_files = []
-        for root, _, files in os.walk(docs_dir):
-            for filename in files:
-                # Skip hidden files and markdown files
-                if not filename.startswith(".") and not filename.endswith(".md"):
-                    full_path = os.path.join(root, filename)
-                    all_files.append(full_path)
+        all_files = list(_iter_docs(docs_dir))
+        
+        # Fingerprint each file so copies of the same document classify once
+        # (in a background thread, so the event loop isn't blocked meanwhile;
+        # files that haven't changed since last run aren't read again)
+        fingerprints = await asyncio.to_thread(_fingerprint_files, all_files, known_files)
+        hashes = {file_path: entry["hash"] for file_path, entry in fingerprints.items()}
         
-        print(f"\n📄 Found {len(all_files)} documents total")
+        # Old-format results: look each file up by the hash we just worked out
+        for file_path, classification in old_results.items():
+            if file_path in hashes:
+                results_by_hash.setdefault(hashes[file_path], classification)
+        
+        print(f"\n📄 Found {len(all_files)} documents total "
+              f"({len(set(hashes.values()))} unique)")
+        
+        # Documents we classified before are ready right away
+        for file_path, content_hash in hashes.items():
+            if content_hash in results_by_hash:
+                yield file_path, results_by_hash[content_hash]
         
         # Step 3: Classify only new documents (ones we haven't seen before)
-        new_files = [f for f in all_files if f not in results]
+        new_files = {}  # {content_hash: first file with that content}
+        copies = {}  # {content_hash: [every file with that content]}
+        for file_path, content_hash in hashes.items():
+            if content_hash not in results_by_hash:
+                new_files.setdefault(content_hash, file_path)
+                copies.setdefault(content_hash, []).append(file_path)
         
         if new_files:
             print(f"🔍 Classifying {len(new_files)} new documents...\n")
             
-            for file_path in new_files:
-                filename = os.path.basename(file_path)
-                print(f"  Processing: {filename}...", end=" ")
+            # Only let a few requests run at once so we don't flood Gemini
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_CLASSIFICATIONS)
+            
+            # Write each answer down as soon as we get it, so a crash
+            # halfway through doesn't lose the documents already done
+            journal = None
+            if journal_file:
+                os.makedirs(os.path.dirname(journal_file), exist_ok=True)
+                journal = open(journal_file, "a", encoding="utf-8")
+            
+            async def classify_one(content_hash, file_path):
+                async with semaphore:
+                    try:
+                        classification = await self._ask_gemini_to_classify(file_path,
+                                                                            content_hash)
+                    except Exception:
+                        classification = None
                 
-                # Ask Gemini to classify this document
-                classification = self._ask_gemini_to_classify(file_path)
+                filename = os.path.basename(file_path)
                 
                 if classification:
-                    results[file_path] = classification
+                    results_by_hash[content_hash] = classification
+                    if journal:
+                        journal.write(json_io.dumps({"hash": content_hash, "path": file_path,
+                                                     "result": classification}) + "\n")
+                        journal.flush()
                     doc_type = classification.get("document_type", "unknown")
                     confidence = classification.get("confidence", 0)
-                    print(f"✓ {doc_type} (confidence: {confidence:.0%})")
+                    print(f"  {filename}: ✓ {doc_type} (confidence: {confidence:.0%})")
                 else:
-                    results[file_path] = {"document_type": "failed", "confidence": 0.0}
-                    print("✗ failed")
+                    results_by_hash[content_hash] = {"document_type": "failed", "confidence": 0.0}
+                    print(f"  {filename}: ✗ failed")
+                
+                return content_hash
+            
+            # Ask Gemini to classify all new documents at the same time,
+            # and hand out each one (with all its copies) as soon as it's done
+            try:
+                tasks = [classify_one(content_hash, file_path)
+                         for content_hash, file_path in new_files.items()]
+                for next_done in asyncio.as_completed(tasks):
+                    content_hash = await next_done
+                    for file_path in copies[content_hash]:
+                        yield file_path, results_by_hash[content_hash]
+            finally:
+                if journal:
+                    journal.close()
         else:
             print("✓ All documents already classified!\n")
         
         # Step 4: Save results to cache file
         if cache_file:
             os.makedirs(os.path.dirname(cache_file), exist_ok=True)
-            with open(cache_file, "w") as f:
-                json.dump(results, f, indent=2)
+            with open(cache_file, "w", encoding="utf-8") as f:
+                f.write(json_io.dumps({"by_hash": results_by_hash, "paths": fingerprints},
+                                      indent=True))
             print(f"\n💾 Saved results to {cache_file}")
-        
-        return results
+            
+            # Everything is in the main file now, so start the next run fresh
+            if os.path.exists(journal_file):
+                os.remove(journal_file)
     
-    def _ask_gemini_to_classify(self, file_path: str):
+    async def _ask_gemini_to_classify(self, file_path: str, content_hash: str):
         """
         Internal helper: Send a file to Gemini and ask what type it is
+        
+        content_hash: The file's fingerprint (so we don't read it again for the cache key)
         """
         try:
-            # Step 1: Upload the file to Gemini
-            file_obj = self._upload_file(file_path)
+            # Step 1: Did we already ask Gemini about this exact file + prompt?
+            # (the cache is a SQLite file, so look it up in a background thread)
+            key = llm_cache.make_key(content_hash, self._instructions)
+            cached = await asyncio.to_thread(llm_cache.get, key)
+            if cached is not None:
+                return cached
             
-            # Step 2: Read our prompt that tells Gemini what to do
-            prompt_file = "prompts/classify_document.md"
-            with open(prompt_file, "r") as f:
-                instructions = f.read()
+            # Step 2: Upload the file to Gemini
+            file_obj = await self._upload_file(file_path)
             
-            # Step 3: Create a Gemini model and ask it
-            model = genai.GenerativeModel("gemini-2.0-flash-exp")
-            response = model.generate_content([
-                instructions,
-                "\n\nClassify this file and return only JSON.",
-                file_obj
-            ])
+            # Step 3: Ask Gemini (if the instructions are cached, only send the file)
+            if self._prompt_cache:
+                model = genai.GenerativeModel.from_cached_content(self._prompt_cache)
+                contents = ["Classify this file and return only JSON.", file_obj]
+            else:
+                model = genai.GenerativeModel("gemini-2.0-flash-exp")
+                contents = [self._instructions,
+                            "\n\nClassify this file and return only JSON.", file_obj]
+            response = await model.generate_content_async(contents, stream=True)
             
-            # Step 4: Extract the JSON response
-            response_text = response.text.strip()
+            # Step 4: Read the answer as it arrives, and stop as soon as
+            # it contains a complete JSON object (it's between { and })
+            classification = await gemini_stream.read_json_async(response)
             
-            # Find JSON in the response (it's between { and })
-            json_match = re.search(r"\{[\s\S]*\}", response_text)
-            if json_match:
-                classification = json.loads(json_match.group(0))
-                return classification
-            
-            return None
+            if classification is not None:
+                await asyncio.to_thread(llm_cache.set, key, classification)
+            return classification
             
         except Exception as e:
-            print(f"\n  Error: {e}")
+            print(f"\n  Error ({os.path.basename(file_path)}): {e}")
             return None
     
-    def _upload_file(self, file_path: str):
+    async def _upload_file(self, file_path: str):
         """
         Internal helper: Upload a file to Gemini (with caching to avoid re-uploads)
         """
@@ -134,8 +320,13 @@ class DocumentClassifierAgent:
         if file_path in self.cache:
             return self.cache[file_path]
         
-        # Upload it
-        file_obj = genai.upload_file(file_path)
+        # Upload it (use the async version if this genai has one,
+        # otherwise run the normal upload in a background thread)
+        upload_async = getattr(genai, "upload_file_async", None)
+        if upload_async:
+            file_obj = await upload_async(file_path)
+        else:
+            file_obj = await asyncio.to_thread(genai.upload_file, file_path)
         
         # Remember it for next time
         self.cache[file_path] = file_obj
@@ -0,0 +1,71 @@
+"""
+Simple Gemini Stream Reader
+
+What this does:
+- Reads a streamed Gemini answer (generate_content(..., stream=True)) piece by piece
+- Only looks for the JSON again when a new piece could have finished it (has a })
+- Stops Gemini's stream as soon as a complete JSON object is in
+
+Think of it like: Hanging up the phone as soon as you've heard the answer
+"""
+
+from . import json_io
+
+
+def read_json(response):
+    """
+    Read a streamed Gemini answer until it contains a complete JSON object
+    
+    response: What model.generate_content(..., stream=True) returned
+    
+    Returns: The parsed object, or None if the answer didn't have one
+    """
+    text = ""
+    for chunk in response:
+        text += chunk.text
+        
+        # An object can only have just finished if this piece has a }
+        if "}" in chunk.text:
+            result = json_io.find_object(text)
+            if result is not None:
+                _stop(response)
+                return result
+    
+    # The whole answer is in - look once more, past any stray {
+    return json_io.find_object(text, finished=True)
+
+
+async def read_json_async(response):
+    """
+    Same as read_json, for model.generate_content_async(..., stream=True)
+    """
+    text = ""
+    async for chunk in response:
+        text += chunk.text
+        
+        # An object can only have just finished if this piece has a }
+        if "}" in chunk.text:
+            result = json_io.find_object(text)
+            if result is not None:
+                _stop(response)
+                return result
+    
+    # The whole answer is in - look once more, past any stray {
+    return json_io.find_object(text, finished=True)
+
+
+def _stop(response):
+    """
+    Internal helper: Tell Gemini we don't need the rest of the answer
+    (just leaving the loop would leave the stream open until Gemini finishes)
+    """
+    # The response wraps a gRPC or REST stream - both kinds can be cancelled
+    stream = getattr(response, "_iterator", None)
+    cancel = getattr(stream, "cancel", None)
+    if cancel is None:
+        return
+    
+    try:
+        cancel()
+    except Exception:
+        pass  # Already finished - nothing left to stop
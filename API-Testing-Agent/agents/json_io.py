@@ -0,0 +1,104 @@
+"""
+Simple Fast JSON
+
+What this does:
+- Uses orjson (a much faster JSON library) when it's installed
+- Falls back to Python's built-in json module when it isn't
+
+Think of it like: The same json.loads / json.dumps, just quicker
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data):
+    """
+    Parse JSON text (str or bytes) into Python objects
+    """
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, indent: bool = False) -> str:
+    """
+    Turn Python objects into JSON text
+    
+    indent: Pretty-print with 2 spaces (for files people will read)
+    """
+    if orjson:
+        option = orjson.OPT_INDENT_2 if indent else 0
+        return orjson.dumps(obj, option=option).decode()
+    return json.dumps(obj, indent=2 if indent else None)
+
+
+def find_object(text: str, finished: bool = False):
+    """
+    Find the JSON object inside a bigger piece of text (like a Gemini answer)
+    
+    finished: True once the whole text has arrived. While it's still streaming,
+              a { that isn't closed yet might still be the object, so we wait;
+              once it's finished, such a { was just plain text and we look past it
+    
+    Returns: The parsed object, or None if there isn't a complete one (yet)
+    """
+    start = text.find("{")
+    while start != -1:
+        candidate = extract_first_json(text, start)
+        if candidate is None:
+            if not finished:
+                return None  # The object isn't finished yet
+            # A { that never closes (like "Note { then ...") - try the next {
+            start = text.find("{", start + 1)
+            continue
+        try:
+            return loads(candidate)
+        except ValueError:
+            # Braces in plain text (like "{see below}") - try the next {
+            start = text.find("{", start + 1)
+    return None
+
+
+def extract_first_json(text: str, start: int = 0):
+    """
+    Cut out the first complete {...} block in some text
+    
+    Walks forward once, counting { and } (but not the ones inside "strings"),
+    so it stops at the end of the first object even if more text or more
+    objects follow.
+    
+    Returns: The block as a string, or None if no block is complete
+    """
+    start = text.find("{", start)
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped = False
+    
+    for i in range(start, len(text)):
+        char = text[i]
+        
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    
+    return None
@@ -0,0 +1,115 @@
+"""
+Simple LLM Response Cache
+
+What this does:
+- Remembers Gemini's answers on disk (in a small SQLite file)
+- Answers are looked up by a key: a SHA-256 hash of everything we sent
+- If we ask the exact same question again (same file, same error), we skip Gemini
+
+Think of it like: A notebook of questions we already asked, with their answers
+
+Usage:
+    from agents import llm_cache
+
+    llm_cache.configure("outputs")  # Folder to keep the cache in (optional)
+    answer = llm_cache.get(key)
+    if answer is None:
+        answer = ask_gemini(...)
+        llm_cache.set(key, answer)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from . import json_io
+
+
+# Where the answers are saved (change it with configure)
+CACHE_PATH = os.path.join("outputs", "llm_cache.sqlite")
+
+_lock = threading.Lock()  # Gemini calls can run in several threads
+_stats = {"hits": 0, "misses": 0}
+
+
+def configure(output_dir: str):
+    """
+    Keep the cache in a different folder (next to that run's report)
+    
+    output_dir: Folder for llm_cache.sqlite
+    """
+    global CACHE_PATH
+    with _lock:
+        CACHE_PATH = os.path.join(output_dir, "llm_cache.sqlite")
+
+
+def make_key(*parts) -> str:
+    """
+    Build a cache key from the things we send to Gemini
+    
+    parts: Strings or bytes (prompt, error body, file contents, ...)
+    
+    Returns: A SHA-256 hex string
+    """
+    digest = hashlib.sha256()
+    _add_parts(digest, parts)
+    return digest.hexdigest()
+
+
+def get(key: str):
+    """
+    Look up a saved answer
+    
+    Returns: The saved answer, or None if we never asked this before
+    """
+    with _lock:
+        with closing(_connect()) as conn:
+            row = conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+        
+        if row is None:
+            _stats["misses"] += 1
+            return None
+        
+        _stats["hits"] += 1
+        return json_io.loads(row[0])
+
+
+def set(key: str, value):
+    """
+    Save an answer (must be something JSON can store, like a dict)
+    """
+    with _lock:
+        with closing(_connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)",
+                (key, json_io.dumps(value))
+            )
+
+
+def stats() -> dict:
+    """
+    How many lookups found a saved answer (hits) and how many didn't (misses)
+    """
+    with _lock:
+        return dict(_stats)
+
+
+def _connect():
+    """
+    Internal helper: Open the SQLite file (and create the table the first time)
+    """
+    os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+    conn = sqlite3.connect(CACHE_PATH)
+    conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT)")
+    return conn
+
+
+def _add_parts(digest, parts):
+    """
+    Internal helper: Feed strings/bytes into a hash
+    """
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        digest.update(part)
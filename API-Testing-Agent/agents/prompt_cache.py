@@ -0,0 +1,73 @@
+"""
+Simple Prompt Cache
+
+What this does:
+- Reads a prompt file (like prompts/normalize_error.md) once
+- Uploads it to Gemini's context cache so later calls can point at it
+- Each Gemini call then only sends the part that changes (the file or error)
+
+Think of it like: Giving Gemini the instructions once instead of every time
+"""
+
+import datetime
+from google.generativeai import caching
+
+
+# Gemini refuses to cache anything smaller than this many tokens
+# (the exact minimum depends on the model; this is the common one)
+MIN_CACHE_TOKENS = 4096
+
+# Rough rule: one token is about 4 characters of English text
+CHARS_PER_TOKEN = 4
+
+
+def load_cached_prompt(prompt_file: str, model_name: str, ttl_seconds: int = 3600):
+    """
+    Read a prompt and put it in Gemini's context cache
+    
+    prompt_file: Path to the prompt (markdown file)
+    model_name: Gemini model the cache is made for
+    ttl_seconds: How long Gemini keeps the cache around
+    
+    Returns: (instructions, cache) - cache is None if Gemini can't cache it
+             (for example when the prompt is below the model's minimum size),
+             in which case just send the instructions with every call
+    
+    Note: Creating the cache is a network call, so from async code run this
+    with asyncio.to_thread. Call delete_cached_prompt(cache) when you're done.
+    """
+    with open(prompt_file, "r") as f:
+        instructions = f.read()
+    
+    # Too short to cache - don't even ask Gemini (it would just say no)
+    if len(instructions) // CHARS_PER_TOKEN < MIN_CACHE_TOKENS:
+        return instructions, None
+    
+    try:
+        cache = caching.CachedContent.create(
+            model=model_name,
+            system_instruction=instructions,
+            ttl=datetime.timedelta(seconds=ttl_seconds)
+        )
+    except Exception as e:
+        print(f"    (Prompt caching not available for {prompt_file}: {e})")
+        cache = None
+    
+    return instructions, cache
+
+
+def delete_cached_prompt(cache):
+    """
+    Remove a prompt from Gemini's context cache
+    (so we stop paying to store it once we're done)
+    
+    cache: What load_cached_prompt returned (None is fine, nothing happens)
+    """
+    if cache is None:
+        return
+    
+    try:
+        cache.delete()
+    except Exception as e:
+        # It expires on its own after ttl_seconds anyway
+        print(f"    (Couldn't delete cached prompt: {e})")
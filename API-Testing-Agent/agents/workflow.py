@@ -4,13 +4,15 @@ Simple Workflow - No LangGraph needed!
 This is a simple step-by-step workflow that:
 1. Runs Document Classifier Agent → Gets document classifications
 2. Runs API Testing Agent → Tests APIs with those documents
+   (at the same time as step 1: each document is used as soon as it's classified)
 3. Generates a report
 
-Think of it like: A checklist that runs each step in order
+Think of it like: A checklist, where step 2 starts as soon as step 1 has something for it
 """
 
-import json
+import asyncio
 import os
+from . import json_io, llm_cache
 from .document_classifier_agent import DocumentClassifierAgent
 from .api_testing_agent import APITestingAgent
 
@@ -25,6 +27,20 @@ def run_workflow(docs_dir: str, postman_collection_path: str,
     postman_env_path: Path to your environment file (or None)
     output_dir: Where to save the results
     
+    Returns: Dictionary with results
+    """
+    return asyncio.run(run_workflow_async(docs_dir, postman_collection_path,
+                                          postman_env_path, output_dir))
+
+
+async def run_workflow_async(docs_dir: str, postman_collection_path: str, 
+                             postman_env_path: str, output_dir: str):
+    """
+    Same as run_workflow, for when you're already inside asyncio
+    
+    Steps 1 and 2 run at the same time: each document goes to the API tester
+    as soon as it's classified, so testing starts before classification ends.
+    
     Returns: Dictionary with results
     """
     
@@ -41,58 +57,81 @@ def run_workflow(docs_dir: str, postman_collection_path: str,
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
+    # Keep Gemini's saved answers with the rest of this run's results
+    llm_cache.configure(output_dir)
+    
     # ============================================================
-    # STEP 1: Document Classification
+    # STEP 1 + 2: Document Classification and API Testing
     # ============================================================
-    print("\n📋 STEP 1: CLASSIFYING DOCUMENTS")
+    print("\n📋 STEP 1 + 2: CLASSIFYING DOCUMENTS AND TESTING APIs")
     print("-" * 70)
     
+    api_tester = None
+    
     try:
         # Create the document classifier agent
-        classifier = DocumentClassifierAgent(api_key=api_key)
-        
-        # Run classification
-        cache_file = os.path.join(output_dir, "document_classifications.json")
-        doc_map = classifier.classify_documents(docs_dir, cache_file)
-        
-        print(f"\n✅ Step 1 Complete: Classified {len(doc_map)} documents")
+        # (in a thread: caching its prompt on Gemini is a blocking network call)
+        classifier = await asyncio.to_thread(DocumentClassifierAgent, api_key=api_key)
         
     except Exception as e:
         print(f"\n❌ Step 1 Failed: {e}")
         return {"success": False, "error": str(e), "step": 1}
     
-    # ============================================================
-    # STEP 2: API Testing
-    # ============================================================
-    print("\n\n🧪 STEP 2: TESTING APIs")
-    print("-" * 70)
-    
     try:
         # Create the API testing agent
-        api_tester = APITestingAgent(api_key=api_key)
-        
-        # Give it the document classifications
-        api_tester.set_documents(doc_map)
+        api_tester = await asyncio.to_thread(APITestingAgent, api_key=api_key)
         
         # Load environment variables if provided
         if postman_env_path and os.path.exists(postman_env_path):
-            with open(postman_env_path, "r") as f:
-                env_data = json.load(f)
+            with open(postman_env_path, "rb") as f:
+                env_data = json_io.loads(f.read())
                 env_vars = {}
                 for var in env_data.get("values", []):
                     if var.get("enabled", True):
                         env_vars[var["key"]] = var.get("value", "")
                 api_tester.set_environment(env_vars)
         
-        # Test the APIs
-        results = api_tester.test_apis(postman_collection_path)
+        doc_map = {}
+        doc_queue = asyncio.Queue()  # Classified documents on their way to the tester
+        cache_file = os.path.join(output_dir, "document_classifications.json")
+        
+        async def classify():
+            # Step 1: Hand each document over as soon as it's classified
+            try:
+                async for file_path, classification in classifier.iter_classifications(
+                        docs_dir, cache_file):
+                    doc_map[file_path] = classification
+                    await doc_queue.put((file_path, classification))
+            finally:
+                # Tell the API tester there are no more documents
+                await doc_queue.put(None)
+        
+        # Step 2: Test the APIs while documents are still being classified
+        classified, results = await asyncio.gather(
+            classify(),
+            api_tester.test_apis_async(postman_collection_path, doc_queue),
+            return_exceptions=True
+        )
         
-        print(f"\n✅ Step 2 Complete: Tested {len(results)} APIs")
+        if isinstance(classified, Exception):
+            print(f"\n❌ Step 1 Failed: {classified}")
+            return {"success": False, "error": str(classified), "step": 1}
+        if isinstance(results, Exception):
+            raise results
+        
+        print(f"\n✅ Step 1 Complete: Classified {len(doc_map)} documents")
+        print(f"✅ Step 2 Complete: Tested {len(results)} APIs")
         
     except Exception as e:
         print(f"\n❌ Step 2 Failed: {e}")
         return {"success": False, "error": str(e), "step": 2}
     
+    finally:
+        # Remove the prompts the agents cached on Gemini (we're done with them)
+        await asyncio.to_thread(classifier.close)
+        if api_tester:
+            await asyncio.to_thread(api_tester.close)
+    
     # ============================================================
     # STEP 3: Generate Report
     # ============================================================
@@ -100,45 +139,13 @@ def run_workflow(docs_dir: str, postman_collection_path: str,
     print("-" * 70)
     
     try:
-        # Create a simplified report
-        report = []
-        
-        for result in results:
-            api_entry = {
-                "apiName": result["api_name"],
-                "method": result.get("method", "POST"),
-                "url": result.get("url", ""),
-                "correctFiles": [],
-                "failedFiles": []
-            }
-            
-            # Check initial result
-            if result["success"]:
-                api_entry["correctFiles"].append({
-                    "fileName": os.path.basename(result["file_used"]),
-                    "docType": result.get("document_type", "unknown")
-                })
-            else:
-                api_entry["failedFiles"].append({
-                    "nameOfFile": os.path.basename(result["file_used"]),
-                    "docType": result.get("document_type", "unknown"),
-                    "errorMessage": result.get("error_message", "")[:200]
-                })
-            
-            # Check if retry succeeded
-            if result.get("retry_success") and result.get("correct_document"):
-                correct_doc = result["correct_document"]
-                api_entry["correctFiles"].append({
-                    "fileName": os.path.basename(correct_doc),
-                    "docType": doc_map[correct_doc].get("document_type", "unknown")
-                })
-            
-            report.append(api_entry)
+        # Create a simplified report (one entry per API)
+        report = [_to_entry(result, doc_map) for result in results]
         
         # Save report
         report_path = os.path.join(output_dir, "report.json")
-        with open(report_path, "w") as f:
-            json.dump(report, f, indent=2)
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(json_io.dumps(report, indent=True))
         
         print(f"✅ Report saved to: {report_path}")
         
@@ -155,6 +162,8 @@ def run_workflow(docs_dir: str, postman_collection_path: str,
     print(f"📁 Documents classified: {len(doc_map)}")
     print(f"🧪 APIs tested: {len(results)}")
     print(f"📊 Report: {report_path}")
+    cache_stats = llm_cache.stats()
+    print(f"🧠 Gemini cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
     print("="*70 + "\n")
     
     return {
@@ -164,3 +173,39 @@ def run_workflow(docs_dir: str, postman_collection_path: str,
         "report_path": report_path,
         "results": results
     }
+
+
+def _to_entry(result: dict, doc_map: dict):
+    """
+    Internal helper: Turn one API test result into a report entry
+    """
+    # Check initial result
+    if result["success"]:
+        correct_files = [{
+            "fileName": os.path.basename(result["file_used"]),
+            "docType": result.get("document_type", "unknown")
+        }]
+        failed_files = []
+    else:
+        correct_files = []
+        failed_files = [{
+            "nameOfFile": os.path.basename(result["file_used"]),
+            "docType": result.get("document_type", "unknown"),
+            "errorMessage": result.get("error_message", "")[:200]
+        }]
+    
+    # Check if retry succeeded
+    if result.get("retry_success") and result.get("correct_document"):
+        correct_doc = result["correct_document"]
+        correct_files.append({
+            "fileName": os.path.basename(correct_doc),
+            "docType": doc_map[correct_doc].get("document_type", "unknown")
+        })
+    
+    return {
+        "apiName": result["api_name"],
+        "method": result.get("method", "POST"),
+        "url": result.get("url", ""),
+        "correctFiles": correct_files,
+        "failedFiles": failed_files
+    }